@@ -0,0 +1,186 @@
+"""
+Бенчмарки страниц: время, пиковая память и прирост
+числа живых блоков памяти (tracemalloc) на запрос.
+
+Запуск из корня проекта:
+    python bench.py
+Используется отдельная временная SQLite-база, app.db не трогается.
+"""
+import os
+import sys
+import time
+import uuid
+import datetime
+import tempfile
+import tracemalloc
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+REQUESTS = 200
+THESES_PER_USER = 5
+USERS = 50
+
+
+def seed():
+    db = main.SessionLocal()
+    long_text = "Lorem ipsum dolor sit amet. " * 200
+    token = None
+
+    for i in range(USERS):
+        user = main.User(
+            email=f"user{i}@bench.local",
+            fullname=f"Участник {i}",
+            password_hash="x",
+            role="speaker",
+            is_admin=1 if i == 0 else 0,
+        )
+        db.add(user)
+        db.flush()
+
+        for j in range(THESES_PER_USER):
+            db.add(main.Thesis(user_id=user.id, title=f"Тезис {i}.{j}", abstract=long_text))
+
+        db.add(main.Application(
+            user_id=user.id, role="speaker", full_name=user.fullname,
+            email=user.email, thesis=long_text, interests=long_text,
+        ))
+        db.add(main.ContactMessage(name=user.fullname, email=user.email, message="Вопрос"))
+
+        if i == 0:
+            token = str(uuid.uuid4())
+            db.add(main.SessionToken(
+                token=token, user_id=user.id,
+                expires_at=datetime.datetime.utcnow() + datetime.timedelta(hours=2),
+            ))
+
+    db.commit()
+    db.close()
+    return token
+
+
+def measure(client, path):
+    client.get(path)  # прогрев: шаблоны, кэши SQLAlchemy
+
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get(path)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    for _ in range(REQUESTS):
+        client.get(path)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(s.count_diff for s in after.compare_to(before, "filename") if s.count_diff > 0)
+
+    return {
+        "ms": elapsed / REQUESTS * 1000,
+        "peak_kb": peak / 1024,
+        "blocks": blocks / REQUESTS,
+    }
+
+
+def report(title, results):
+    print(f"\n{title}")
+    print(f"{'path':<24}{'ms/req':>10}{'peak KiB':>12}{'net blk/req':>12}")
+    for path, r in results.items():
+        print(f"{path:<24}{r['ms']:>10.2f}{r['peak_kb']:>12.1f}{r['blocks']:>12.1f}")
+
+
+def bench_pages(client):
+    paths = ["/", "/apply", "/thesis", "/profile", "/admin", "/api/theses/random"]
+    report("Страницы", {p: measure(client, p) for p in paths})
+
+
+def bench_compression(client):
+    paths = ["/", "/profile", "/admin", "/api/theses/random"]
+    encodings = ["identity", "gzip", "br"]
+
+    print("\nСжатие: байт на ответ и CPU (мс) на ответ")
+    print(f"{'path':<24}" + "".join(f"{e + ' B':>13}{e + ' ms':>12}" for e in encodings) + f"{'304 B':>10}")
+    for path in paths:
+        row = f"{path:<24}"
+        for encoding in encodings:
+            headers = {"Accept-Encoding": encoding}
+            size = client.get(path, headers=headers).num_bytes_downloaded
+
+            started = time.process_time()
+            for _ in range(REQUESTS):
+                client.get(path, headers=headers)
+            cpu = (time.process_time() - started) / REQUESTS * 1000
+            row += f"{size:>13}{cpu:>12.2f}"
+
+        etag = client.get(path).headers.get("etag")
+        revalidated = client.get(path, headers={"If-None-Match": etag}) if etag else None
+        row += f"{revalidated.num_bytes_downloaded if revalidated is not None and revalidated.status_code == 304 else '-':>10}"
+        print(row)
+
+
+def template_contexts():
+    db = main.SessionLocal()
+    try:
+        user = main.CurrentUser(*db.query(
+            main.User.id, main.User.email, main.User.fullname, main.User.role, main.User.is_admin
+        ).filter(main.User.is_admin == 1).first())
+        return {
+            "index.html": {"request": None, "user": user},
+            "profile.html": {
+                "request": None, "user": user,
+                "theses": main.fetch_user_theses(db, user.id),
+                "last_application": main.fetch_last_application(db, user.id),
+            },
+            "admin.html": {"request": None, "user": user, **main.fetch_admin_tables(db)},
+        }
+    finally:
+        db.close()
+
+
+def bench_templates():
+    contexts = template_contexts()
+    cache_dir = tempfile.mkdtemp(prefix="jinja-", dir=_tmp_dir)
+    variants = [
+        ("development", "development", None),
+        ("production", "production", None),
+        ("prod + bytecode (cold)", "production", cache_dir),
+        ("prod + bytecode (warm)", "production", cache_dir),
+    ]
+
+    print("\nШаблоны: старт (создание окружения + первый рендер трёх страниц) и рендер")
+    print(f"{'mode':<26}{'startup ms':>12}" + "".join(f"{name:>16}" for name in contexts))
+    for label, mode, cache in variants:
+        started = time.perf_counter()
+        env = main.create_templates(mode, cache).env
+        for name, context in contexts.items():
+            env.get_template(name).render(context)
+        startup = (time.perf_counter() - started) * 1000
+
+        row = f"{label:<26}{startup:>12.1f}"
+        for name, context in contexts.items():
+            started = time.perf_counter()
+            for _ in range(REQUESTS):
+                env.get_template(name).render(context)
+            row += f"{(time.perf_counter() - started) / REQUESTS * 1000:>13.3f} ms"
+        print(row)
+
+
+def run():
+    token = seed()
+    client = TestClient(main.app)
+    client.cookies.set("session_token", token)
+
+    bench_pages(client)
+    bench_compression(client)
+    bench_templates()
+
+
+if __name__ == "__main__":
+    sys.exit(run())
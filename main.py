@@ -2,7 +2,17 @@ import os
 import uuid
 import datetime
 import re
-from typing import Optional
+import time
+import gzip
+import hashlib
+import json
+import asyncio
+import tempfile
+import zipfile
+from collections import defaultdict
+from collections import namedtuple
+from typing import List, Optional
+from urllib.parse import quote
 from fastapi.responses import FileResponse
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
@@ -10,12 +20,21 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 from reportlab.lib.pagesizes import A4
 from fastapi import (
-    FastAPI, Request, Response, Depends, Form, HTTPException, Body
+    FastAPI, Request, Response, Depends, Form, HTTPException, Body, BackgroundTasks
 )
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+import jinja2
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него остаётся gzip
+    brotli = None
 
 from pydantic import BaseModel, EmailStr
 from passlib.context import CryptContext
@@ -26,7 +45,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.orm import (
     sessionmaker, declarative_base,
-    relationship, Session
+    relationship, Session, load_only
 )
 
 # -------------------------------------------------
@@ -35,6 +54,54 @@ from sqlalchemy.orm import (
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Ответы меньше порога не сжимаются: выигрыш меньше затрат CPU
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_TYPES = ("text/html", "application/json")
+
+# Cache-Control по префиксу пути, первое совпадение побеждает
+CACHE_CONTROL_RULES = [
+    ("/api/theses/random", "no-store"),
+    # URL скриптов и стилей без версии, а разметка страниц меняется вместе
+    # с ними: браузер перепроверяет их по ETag/Last-Modified от StaticFiles
+    ("/style/", "no-cache"),
+    ("/scripts/", "no-cache"),
+    ("/assets/", "public, max-age=86400"),
+]
+# Персональные страницы никогда не кэшируются публично
+PRIVATE_PATHS = ("/profile", "/admin", "/apply", "/thesis")
+DEFAULT_CACHE_CONTROL = "no-cache"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+# SSE: пинг держит соединение через прокси, очередь ограничивает отстающих
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+
+# Вложения тезисов: файлы лежат по sha256, одинаковые хранятся один раз
+ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", "uploads")
+MAX_ATTACHMENT_SIZE = int(os.getenv("MAX_ATTACHMENT_SIZE", str(20 * 1024 * 1024)))
+MAX_ATTACHMENTS_PER_THESIS = 3
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+# Если задан (например "/protected-uploads/"), файл отдаёт nginx через
+# X-Accel-Redirect и sendfile, приложение только проверяет доступ
+ATTACHMENTS_ACCEL_PREFIX = os.getenv("ATTACHMENTS_ACCEL_PREFIX")
+# Расширение -> (Content-Type, допустимые сигнатуры начала файла)
+ATTACHMENT_TYPES = {
+    ".pdf": ("application/pdf", (b"%PDF-",)),
+    ".doc": ("application/msword", (b"\xd0\xcf\x11\xe0",)),
+    ".docx": (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        (b"PK\x03\x04",)
+    ),
+    ".odt": ("application/vnd.oasis.opendocument.text", (b"PK\x03\x04",)),
+}
+
+# production: все шаблоны компилируются при старте, mtime файлов не проверяются
+TEMPLATE_MODE = os.getenv("TEMPLATE_MODE", "development")
+# Каталог кэша байткода шаблонов, общий для всех воркеров. Под
+# uvicorn --workers каждый воркер импортирует main сам и компилирует
+# шаблоны заново; с этим кэшем компиляция идёт один раз на весь сервер
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+
 # -------------------------------------------------
 # DATABASE
 # -------------------------------------------------
@@ -92,6 +159,23 @@ class Thesis(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     author = relationship("User", back_populates="theses")
+    attachments = relationship(
+        "ThesisAttachment", back_populates="thesis", cascade="all, delete-orphan"
+    )
+
+
+class ThesisAttachment(Base):
+    __tablename__ = "thesis_attachments"
+
+    id = Column(Integer, primary_key=True)
+    thesis_id = Column(Integer, ForeignKey("theses.id", ondelete="CASCADE"), index=True)
+    sha256 = Column(String(64), index=True, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    thesis = relationship("Thesis", back_populates="attachments")
 
 class ContactMessage(Base):
     __tablename__ = "contact_messages"
@@ -122,11 +206,533 @@ class Application(Base):
 
 Base.metadata.create_all(bind=engine)
 
+# -------------------------------------------------
+# READ MODELS
+# -------------------------------------------------
+# Страницы и JSON-эндпоинты только читают несколько полей, поэтому
+# выбираем нужные колонки в лёгкие кортежи без identity map ORM.
+CurrentUser = namedtuple("CurrentUser", "id email fullname role is_admin")
+ThesisItem = namedtuple("ThesisItem", "id title abstract status attachments")
+AttachmentItem = namedtuple("AttachmentItem", "id thesis_id filename size")
+ApplicationSummary = namedtuple("ApplicationSummary", "id role status")
+AdminApplicationRow = namedtuple(
+    "AdminApplicationRow", "id full_name email role status submitted_at"
+)
+AdminThesisRow = namedtuple("AdminThesisRow", "id author_name title status created_at")
+AdminMessageRow = namedtuple("AdminMessageRow", "id name email message created_at")
+
+
+def fetch_last_application(db: Session, user_id: int) -> Optional[ApplicationSummary]:
+    row = (
+        db.query(Application.id, Application.role, Application.status)
+        .filter(Application.user_id == user_id)
+        .order_by(Application.submitted_at.desc())
+        .first()
+    )
+    return ApplicationSummary(*row) if row else None
+
+
+def fetch_user_theses(db: Session, user_id: int) -> list:
+    rows = (
+        db.query(Thesis.id, Thesis.title, Thesis.abstract, Thesis.status)
+        .filter(Thesis.user_id == user_id)
+        .order_by(Thesis.id)
+        .all()
+    )
+
+    attachments = defaultdict(list)
+    for a in (
+        db.query(
+            ThesisAttachment.id, ThesisAttachment.thesis_id,
+            ThesisAttachment.filename, ThesisAttachment.size
+        )
+        .join(Thesis, ThesisAttachment.thesis_id == Thesis.id)
+        .filter(Thesis.user_id == user_id)
+        .order_by(ThesisAttachment.id)
+    ):
+        attachments[a.thesis_id].append(AttachmentItem(*a))
+
+    return [ThesisItem(*r, attachments[r.id]) for r in rows]
+
+
+def fetch_admin_tables(db: Session) -> dict:
+    applications = [
+        AdminApplicationRow(*r) for r in
+        db.query(
+            Application.id, Application.full_name, Application.email,
+            Application.role, Application.status, Application.submitted_at
+        )
+        .order_by(Application.submitted_at.desc())
+        .all()
+    ]
+    theses = [
+        AdminThesisRow(*r) for r in
+        db.query(Thesis.id, User.fullname, Thesis.title, Thesis.status, Thesis.created_at)
+        .outerjoin(User, Thesis.user_id == User.id)
+        .order_by(Thesis.created_at.desc())
+        .all()
+    ]
+    messages = [
+        AdminMessageRow(*r) for r in
+        db.query(
+            ContactMessage.id, ContactMessage.name, ContactMessage.email,
+            ContactMessage.message, ContactMessage.created_at
+        )
+        .order_by(ContactMessage.created_at.desc())
+        .all()
+    ]
+    return {"applications": applications, "theses": theses, "messages": messages}
+
+# -------------------------------------------------
+# RESPONSE OPTIMIZATION
+# -------------------------------------------------
+def cache_control_for(path: str, personalized: bool) -> str:
+    for prefix, policy in CACHE_CONTROL_RULES:
+        if path.startswith(prefix):
+            return policy
+    if personalized or path.startswith(PRIVATE_PATHS):
+        return PRIVATE_CACHE_CONTROL
+    return DEFAULT_CACHE_CONTROL
+
+
+def accepted_encodings(header: str) -> set:
+    result = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        params = params.strip()
+        q = 1.0
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            result.add(name.strip().lower())
+    return result
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Слабое сравнение: префикс W/ не учитывается
+    candidates = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+class ResponseOptimizationMiddleware:
+    """
+    Сжимает HTML/JSON (brotli или gzip), ставит слабый ETag и отвечает 304,
+    проставляет Cache-Control по CACHE_CONTROL_RULES.
+    Остальные ответы (файлы, потоки) проходят без буферизации.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE,
+                 gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        personalized = "session_token=" in request_headers.get("cookie", "")
+        cache_control = cache_control_for(scope["path"], personalized)
+        cacheable = scope["method"] in ("GET", "HEAD")
+
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if "cache-control" not in headers:
+                    headers["cache-control"] = cache_control
+                if cache_control.startswith("private"):
+                    headers.add_vary_header("Cookie")
+
+                content_type = headers.get("content-type", "")
+                if (
+                    not cacheable
+                    or message["status"] != 200
+                    or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESS_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+
+                start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            await self.finish(request_headers, start_message, b"".join(body_parts), send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def finish(self, request_headers, start_message, body, send):
+        headers = MutableHeaders(raw=start_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+
+        if "no-store" not in headers.get("cache-control", ""):
+            etag = 'W/"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+            headers["etag"] = etag
+
+            if etag_matches(request_headers.get("if-none-match", ""), etag):
+                del headers["content-length"]
+                del headers["content-type"]
+                await send({**start_message, "status": 304})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if len(body) >= self.minimum_size:
+            encodings = accepted_encodings(request_headers.get("accept-encoding", ""))
+            if brotli is not None and "br" in encodings:
+                body = brotli.compress(body, quality=self.brotli_quality)
+                headers["content-encoding"] = "br"
+            elif "gzip" in encodings:
+                body = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+                headers["content-encoding"] = "gzip"
+            headers["content-length"] = str(len(body))
+
+        await send(start_message)
+        await send({"type": "http.response.body", "body": body})
+
+
+# -------------------------------------------------
+# LIVE EVENTS
+# -------------------------------------------------
+class EventBroker:
+    """
+    Pub/sub внутри процесса для SSE. Каналы: "admin" (/events?scope=admin)
+    и "user:<id>" (/events).
+    Событие сериализуется один раз и раскладывается по очередям подписчиков;
+    каждый подписчик — одна ограниченная asyncio.Queue.
+    """
+
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._channels = defaultdict(set)
+
+    def subscribe(self, channels) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for channel in channels:
+            self._channels[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, channels):
+        for channel in channels:
+            subscribers = self._channels.get(channel)
+            if subscribers is None:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._channels[channel]
+
+    def publish(self, channels, event: str, data: dict):
+        message = f"event: {event}\ndata: {json.dumps(data, default=lambda v: v.isoformat())}\n\n"
+        delivered = set()
+        for channel in channels:
+            for queue in tuple(self._channels.get(channel, ())):
+                if queue in delivered:
+                    continue
+                delivered.add(queue)
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # Отстающий клиент: None завершает его поток, EventSource переподключится
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+
+broker = EventBroker()
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+# -------------------------------------------------
+# ATTACHMENTS STORAGE
+# -------------------------------------------------
+def blob_path(sha256: str) -> str:
+    return os.path.join(ATTACHMENTS_DIR, sha256[:2], sha256)
+
+
+class AttachmentReceiver:
+    """
+    Потоковый разбор multipart/form-data: поле "file" пишется кусками
+    во временный файл рядом с хранилищем, попутно считается sha256.
+    Тело запроса целиком в памяти не держится.
+    """
+
+    def __init__(self):
+        self.filename = None
+        self.content_type = None
+        self.size = 0
+        self.head = b""
+        self.temp_path = None
+        self._hash = hashlib.sha256()
+        self._file = None
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+
+    def on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._headers = {}
+        if options.get(b"name") != b"file" or self._file is not None:
+            return
+
+        # Браузеры на Windows присылают путь вида C:\fakepath\paper.pdf
+        filename = options.get(b"filename", b"").decode("utf-8", "replace").replace("\\", "/")
+        filename = os.path.basename(filename)
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in ATTACHMENT_TYPES:
+            raise HTTPException(415, f"Допустимые форматы: {', '.join(ATTACHMENT_TYPES)}")
+
+        self.filename = filename
+        self.content_type = ATTACHMENT_TYPES[ext][0]
+
+        tmp_dir = os.path.join(ATTACHMENTS_DIR, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=tmp_dir)
+        self._file = os.fdopen(fd, "wb")
+
+    def on_part_data(self, data, start, end):
+        if self._file is None or self._file.closed:
+            return
+
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > MAX_ATTACHMENT_SIZE:
+            raise HTTPException(413, f"Файл больше {MAX_ATTACHMENT_SIZE // (1024 * 1024)} МБ")
+        if len(self.head) < 8:
+            self.head += chunk[:8 - len(self.head)]
+
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def on_part_end(self):
+        if self._file is not None:
+            self._file.close()
+
+    async def receive(self, request: Request):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(400, "Ожидается multipart/form-data")
+
+        parser = MultipartParser(params[b"boundary"], {
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        })
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+            parser.finalize()
+
+            if self._file is None:
+                raise HTTPException(400, "Файл не передан")
+            ext = os.path.splitext(self.filename)[1].lower()
+            if not self.head.startswith(ATTACHMENT_TYPES[ext][1]):
+                raise HTTPException(415, "Содержимое файла не соответствует расширению")
+        except BaseException:
+            self.discard()
+            raise
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def store(self) -> str:
+        """
+        Переносит файл в хранилище; если такой blob уже есть, копия удаляется.
+        Вызывается после коммита строки вложения, см. remove_orphan_blobs.
+        """
+        path = blob_path(self.sha256)
+        if os.path.exists(path):
+            self.discard()
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.temp_path, path)
+        return path
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def referenced_blobs(shas: set) -> set:
+    db = SessionLocal()
+    try:
+        return {
+            sha for (sha,) in
+            db.query(ThesisAttachment.sha256).filter(ThesisAttachment.sha256.in_(shas))
+        }
+    finally:
+        db.close()
+
+
+def remove_orphan_blobs(shas: List[str]):
+    """
+    Фоновая задача: удаляет файлы, на которые не ссылается ни одно вложение.
+
+    Загрузка сначала коммитит строку, потом проверяет наличие blob. Очистка
+    сначала уводит файл в сторону, потом перепроверяет ссылки и возвращает
+    файл, если строка появилась. При любом порядке шагов файл со ссылкой
+    не теряется, блокировка между воркерами не нужна.
+    """
+    shas = set(shas)
+    if not shas:
+        return
+
+    moved = {}
+    for sha in shas - referenced_blobs(shas):
+        path = blob_path(sha)
+        trash = f"{path}.{uuid.uuid4().hex}.trash"
+        try:
+            os.replace(path, trash)
+        except FileNotFoundError:
+            continue
+        moved[sha] = trash
+
+    if not moved:
+        return
+
+    used = referenced_blobs(set(moved))
+    for sha, trash in moved.items():
+        if sha in used:
+            os.replace(trash, blob_path(sha))
+        else:
+            os.remove(trash)
+
+
+class _ZipSink:
+    """Приёмник для zipfile без seek: отдаёт накопленные байты по запросу."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_attachments_zip(rows):
+    # zipfile пишет в поток без seek через data descriptor, временных файлов нет
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for r in rows:
+            path = blob_path(r.sha256)
+            if not os.path.exists(path):
+                continue
+
+            author = (r.author_name or "unknown").replace("/", "_")
+            info = zipfile.ZipInfo(
+                f"{r.thesis_id}-{author}/{r.id}-{r.filename}",
+                date_time=r.created_at.timetuple()[:6]
+            )
+            info.file_size = r.size
+            with open(path, "rb") as src, zf.open(info, "w") as dst:
+                while chunk := src.read(ATTACHMENT_CHUNK_SIZE):
+                    dst.write(chunk)
+                    yield sink.take()
+            yield sink.take()
+    yield sink.take()
+
+
+# -------------------------------------------------
+# TEMPLATES
+# -------------------------------------------------
+# Имя шаблона -> число рендеров, суммарное и максимальное время (мс)
+template_stats = defaultdict(lambda: {"renders": 0, "total_ms": 0.0, "max_ms": 0.0})
+
+
+class TimedTemplate(jinja2.Template):
+    """Шаблон, который записывает время рендера в template_stats."""
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            stats = template_stats[self.name]
+            stats["renders"] += 1
+            stats["total_ms"] += elapsed
+            stats["max_ms"] = max(stats["max_ms"], elapsed)
+
+
+def create_templates(mode: str = TEMPLATE_MODE, cache_dir: Optional[str] = TEMPLATE_CACHE_DIR) -> Jinja2Templates:
+    production = mode == "production"
+
+    bytecode_cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(cache_dir)
+
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader("templates"),
+        autoescape=True,
+        # В production шаблоны (и menu.html, подключаемый из base.html)
+        # берутся из кэша без проверки mtime на каждый get_template
+        auto_reload=not production,
+        cache_size=-1 if production else 400,
+        bytecode_cache=bytecode_cache,
+    )
+    env.template_class = TimedTemplate
+
+    if production:
+        for name in env.list_templates(extensions=["html"]):
+            env.get_template(name)
+
+    return Jinja2Templates(env=env)
+
+
 # -------------------------------------------------
 # FASTAPI APP
 # -------------------------------------------------
 app = FastAPI()
-templates = Jinja2Templates(directory="templates")
+templates = create_templates()
 
 app.mount("/style", StaticFiles(directory="style"), name="style")
 app.mount("/scripts", StaticFiles(directory="scripts"), name="scripts")
@@ -139,6 +745,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ResponseOptimizationMiddleware)
 
 # -------------------------------------------------
 # UTILS
@@ -169,19 +776,24 @@ def create_session(db: Session, user: User, remember: bool) -> str:
     return token
 
 
-def get_current_user(request: Request, db: Session) -> Optional[User]:
+def get_current_user(request: Request, db: Session) -> Optional[CurrentUser]:
     token = request.cookies.get("session_token")
     if not token:
         return None
 
-    s = db.query(SessionToken).filter_by(token=token).first()
-    if not s or s.expires_at < datetime.datetime.utcnow():
-        return None
-
-    return db.query(User).filter_by(id=s.user_id).first()
+    row = (
+        db.query(User.id, User.email, User.fullname, User.role, User.is_admin)
+        .join(SessionToken, SessionToken.user_id == User.id)
+        .filter(
+            SessionToken.token == token,
+            SessionToken.expires_at >= datetime.datetime.utcnow()
+        )
+        .first()
+    )
+    return CurrentUser(*row) if row else None
 
 
-def require_admin(user: User):
+def require_admin(user: Optional[CurrentUser]):
     if not user or not user.is_admin:
         raise HTTPException(403, "Access denied")
 
@@ -195,6 +807,18 @@ def validate_password(password: str):
     if not re.search(r"[!@#$%^&*]", password):
         raise HTTPException(400, "Нужен спецсимвол")
     
+
+def publish_application_status(app_obj: Application):
+    summary = ApplicationSummary(app_obj.id, app_obj.role, app_obj.status)
+    broker.publish(["admin", user_channel(app_obj.user_id)], "application_status", summary._asdict())
+
+
+def publish_thesis_status(thesis_id: int, user_id: int, status: str):
+    broker.publish(
+        ["admin", user_channel(user_id)], "thesis_status",
+        {"id": thesis_id, "status": status}
+    )
+
 # -------------------------------------------------
 # AUTH
 # -------------------------------------------------
@@ -341,7 +965,7 @@ async def apply_page(request: Request, db: Session = Depends(get_db)):
     last_application = None
 
     if user:
-        last_application = db.query(Application).filter_by(user_id=user.id).order_by(Application.submitted_at.desc()).first()
+        last_application = fetch_last_application(db, user.id)
         already_applied = bool(last_application)
 
     return templates.TemplateResponse(
@@ -378,8 +1002,8 @@ async def profile(request: Request, db: Session = Depends(get_db)):
     if not user:
         return RedirectResponse("/", status_code=302)
 
-    theses = db.query(Thesis).filter_by(user_id=user.id).all()
-    last_application = db.query(Application).filter_by(user_id=user.id).order_by(Application.submitted_at.desc()).first()
+    theses = fetch_user_theses(db, user.id)
+    last_application = fetch_last_application(db, user.id)
 
     return templates.TemplateResponse(
         "profile.html",
@@ -407,7 +1031,7 @@ async def submit_application(
         return JSONResponse({"error": "auth_required"}, status_code=401)
 
     # ❗ ОГРАНИЧЕНИЕ: 1 заявка
-    existing = db.query(Application).filter_by(user_id=user.id).first()
+    existing = db.query(Application.id).filter_by(user_id=user.id).first()
     if existing:
         return JSONResponse(
             {"message": "Вы уже подали заявку"},
@@ -428,10 +1052,22 @@ async def submit_application(
 
     db.add(app_obj)
 
-    user.role = data.get("role")
+    # user — проекция без ORM-трекинга, роль обновляем запросом
+    db.query(User).filter_by(id=user.id).update({"role": data.get("role")})
 
+    db.flush()
+    row = AdminApplicationRow(
+        app_obj.id, app_obj.full_name, app_obj.email,
+        app_obj.role, app_obj.status, app_obj.submitted_at
+    )
     db.commit()
 
+    broker.publish(["admin"], "application_created", row._asdict())
+    broker.publish(
+        [user_channel(user.id)], "application_status",
+        ApplicationSummary(row.id, row.role, row.status)._asdict()
+    )
+
     return {"message": "Заявка успешно отправлена"}
 
 
@@ -465,8 +1101,12 @@ async def submit_thesis(
     )
 
     db.add(thesis)
+    db.flush()
+    row = AdminThesisRow(thesis.id, user.fullname, thesis.title, thesis.status, thesis.created_at)
     db.commit()
 
+    broker.publish(["admin"], "thesis_created", row._asdict())
+
     return {"message": "Тезис успешно отправлен"}
 
 
@@ -489,35 +1129,62 @@ async def edit_thesis_page(request: Request, thesis_id: int, db: Session = Depen
 @app.post("/thesis/edit/{thesis_id}")
 async def edit_thesis(
     thesis_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
     title: str = Body(...),
     abstract: str = Body(...),
+    remove_attachments: List[int] = Body([]),
     db: Session = Depends(get_db)
 ):
-    thesis = db.query(Thesis).filter_by(id=thesis_id).first()
+    user = get_current_user(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Необходимо авторизоваться")
+
+    thesis = db.query(Thesis).filter_by(id=thesis_id, user_id=user.id).first()
     if not thesis:
         raise HTTPException(status_code=404, detail="Тезис не найден")
 
     thesis.title = title
     thesis.abstract = abstract
+
+    removed = [a for a in thesis.attachments if a.id in remove_attachments]
+    shas = [a.sha256 for a in removed]
+    for attachment in removed:
+        thesis.attachments.remove(attachment)
     db.commit()
 
+    background_tasks.add_task(remove_orphan_blobs, shas)
+
     return {"message": "Тезис успешно обновлен"}
 
 @app.post("/thesis/delete/{thesis_id}")
-async def delete_thesis(thesis_id: int, db: Session = Depends(get_db)):
-    thesis = db.query(Thesis).filter_by(id=thesis_id).first()
+async def delete_thesis(
+    thesis_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    user = get_current_user(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Необходимо авторизоваться")
+
+    thesis = db.query(Thesis).filter_by(id=thesis_id, user_id=user.id).first()
     if not thesis:
         raise HTTPException(status_code=404, detail="Тезис не найден")
 
+    shas = [a.sha256 for a in thesis.attachments]
     db.delete(thesis)
     db.commit()
 
+    background_tasks.add_task(remove_orphan_blobs, shas)
+
     return {"message": "Тезис успешно удален"}
 
 @app.get("/api/theses/random")
 def random_theses(db: Session = Depends(get_db)):
+    # На главной показываются только первые 160 символов аннотации
     theses = (
-        db.query(Thesis)
+        db.query(Thesis.title, func.substr(Thesis.abstract, 1, 160))
         .filter(Thesis.status == "submitted")
         .order_by(func.random())
         .limit(8)
@@ -526,11 +1193,135 @@ def random_theses(db: Session = Depends(get_db)):
 
     return [
         {
-            "title": t.title,
-            "abstract": t.abstract
-        } for t in theses
+            "title": title,
+            "abstract": abstract
+        } for title, abstract in theses
     ]
 
+# -------------------------------------------------
+#  THESIS ATTACHMENTS
+# -------------------------------------------------
+
+@app.post("/thesis/{thesis_id}/attachments")
+async def upload_attachment(thesis_id: int, request: Request, db: Session = Depends(get_db)):
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse({"error": "auth_required"}, status_code=401)
+
+    if not db.query(Thesis.id).filter_by(id=thesis_id, user_id=user.id).first():
+        raise HTTPException(404, "Тезис не найден")
+
+    count = db.query(ThesisAttachment.id).filter_by(thesis_id=thesis_id).count()
+    if count >= MAX_ATTACHMENTS_PER_THESIS:
+        return JSONResponse(
+            {"message": f"Можно прикрепить не более {MAX_ATTACHMENTS_PER_THESIS} файлов"},
+            status_code=400
+        )
+
+    try:
+        content_length = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPException(400, "Некорректный Content-Length")
+    if content_length > MAX_ATTACHMENT_SIZE + ATTACHMENT_CHUNK_SIZE:
+        raise HTTPException(413, f"Файл больше {MAX_ATTACHMENT_SIZE // (1024 * 1024)} МБ")
+
+    # Не держим соединение с БД, пока идёт загрузка
+    db.close()
+
+    upload = AttachmentReceiver()
+    await upload.receive(request)
+
+    # Тезис могли удалить, пока шла загрузка; SQLite не проверяет FK
+    if not db.query(Thesis.id).filter_by(id=thesis_id, user_id=user.id).first():
+        upload.discard()
+        raise HTTPException(404, "Тезис не найден")
+
+    attachment = ThesisAttachment(
+        thesis_id=thesis_id,
+        sha256=upload.sha256,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        size=upload.size
+    )
+    db.add(attachment)
+    db.flush()
+    item = AttachmentItem(attachment.id, thesis_id, attachment.filename, attachment.size)
+    db.commit()
+
+    # Blob кладём после коммита строки: так очистка не удалит его между шагами
+    try:
+        upload.store()
+    except OSError:
+        upload.discard()
+        db.query(ThesisAttachment).filter_by(id=item.id).delete()
+        db.commit()
+        raise
+
+    return {"message": "Файл прикреплён", "attachment": item._asdict()}
+
+
+@app.get("/attachments/{attachment_id}")
+async def download_attachment(attachment_id: int, request: Request, db: Session = Depends(get_db)):
+    user = get_current_user(request, db)
+    if not user:
+        raise HTTPException(401, "Необходимо авторизоваться")
+
+    row = (
+        db.query(
+            ThesisAttachment.sha256, ThesisAttachment.filename,
+            ThesisAttachment.content_type, Thesis.user_id
+        )
+        .join(Thesis, ThesisAttachment.thesis_id == Thesis.id)
+        .filter(ThesisAttachment.id == attachment_id)
+        .first()
+    )
+    if not row or (row.user_id != user.id and not user.is_admin):
+        raise HTTPException(404, "Файл не найден")
+    if not os.path.exists(blob_path(row.sha256)):
+        raise HTTPException(404, "Файл не найден")
+
+    if ATTACHMENTS_ACCEL_PREFIX:
+        return Response(
+            headers={
+                "X-Accel-Redirect": f"{ATTACHMENTS_ACCEL_PREFIX}{row.sha256[:2]}/{row.sha256}",
+                "Content-Type": row.content_type,
+                "Content-Disposition": f"attachment; filename*=utf-8''{quote(row.filename)}",
+            }
+        )
+
+    # FileResponse сам обрабатывает Range/If-Range и отдаёт файл кусками
+    return FileResponse(blob_path(row.sha256), media_type=row.content_type, filename=row.filename)
+
+
+@app.post("/attachments/{attachment_id}/delete")
+async def delete_attachment(
+    attachment_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    user = get_current_user(request, db)
+    if not user:
+        raise HTTPException(401, "Необходимо авторизоваться")
+
+    attachment = (
+        db.query(ThesisAttachment)
+        .join(Thesis, ThesisAttachment.thesis_id == Thesis.id)
+        .filter(ThesisAttachment.id == attachment_id)
+        .first()
+    )
+    if not attachment or (attachment.thesis.user_id != user.id and not user.is_admin):
+        raise HTTPException(404, "Файл не найден")
+
+    sha = attachment.sha256
+    db.delete(attachment)
+    db.commit()
+
+    background_tasks.add_task(remove_orphan_blobs, [sha])
+
+    return {"message": "Файл удалён"}
+
+
 # -------------------------------------------------
 # ADMIN PANEL
 # -------------------------------------------------
@@ -540,18 +1331,12 @@ async def admin_panel(request: Request, db: Session = Depends(get_db)):
     if not user or not user.is_admin:
         raise HTTPException(status_code=403)
 
-    applications = db.query(Application).order_by(Application.submitted_at.desc()).all()
-    theses = db.query(Thesis).order_by(Thesis.created_at.desc()).all()
-    messages = db.query(ContactMessage).order_by(ContactMessage.created_at.desc()).all()
-
     return templates.TemplateResponse(
         "admin.html",
         {
             "request": request,
             "user": user,
-            "applications": applications,
-            "theses": theses,
-            "messages": messages
+            **fetch_admin_tables(db)
         }
     )
 
@@ -559,20 +1344,32 @@ async def admin_panel(request: Request, db: Session = Depends(get_db)):
 async def approve_thesis(thesis_id: int, request: Request, db: Session = Depends(get_db)):
     user = get_current_user(request, db)
     require_admin(user)
-    thesis = db.query(Thesis).filter_by(id=thesis_id).first()
+    thesis = (
+        db.query(Thesis)
+        .options(load_only(Thesis.id, Thesis.user_id, Thesis.status))
+        .filter_by(id=thesis_id)
+        .first()
+    )
     if not thesis: raise HTTPException(404, "Тезис не найден")
     thesis.status = "approved"
     db.commit()
+    publish_thesis_status(thesis_id, thesis.user_id, "approved")
     return {"message": "Тезис одобрен"}
 
 @app.post("/admin/thesis/{thesis_id}/reject")
 async def reject_thesis(thesis_id: int, request: Request, db: Session = Depends(get_db)):
     user = get_current_user(request, db)
     require_admin(user)
-    thesis = db.query(Thesis).filter_by(id=thesis_id).first()
+    thesis = (
+        db.query(Thesis)
+        .options(load_only(Thesis.id, Thesis.user_id, Thesis.status))
+        .filter_by(id=thesis_id)
+        .first()
+    )
     if not thesis: raise HTTPException(404, "Тезис не найден")
     thesis.status = "rejected"
     db.commit()
+    publish_thesis_status(thesis_id, thesis.user_id, "rejected")
     return {"message": "Тезис отклонён"}
 
 @app.post("/admin/application/{app_id}/approve")
@@ -580,13 +1377,19 @@ async def approve_application(app_id: int, request: Request, db: Session = Depen
     user = get_current_user(request, db)
     require_admin(user)
 
-    app_obj = db.query(Application).filter_by(id=app_id).first()
+    app_obj = (
+        db.query(Application)
+        .options(load_only(Application.id, Application.user_id, Application.role, Application.status))
+        .filter_by(id=app_id)
+        .first()
+    )
     if not app_obj:
         raise HTTPException(404, detail="Заявка не найдена")
 
     app_obj.status = "approved"
     app_obj.user.role = app_obj.role
     db.commit()
+    publish_application_status(app_obj)
     return JSONResponse({"message": "Заявка одобрена"}, status_code=200)
 
 
@@ -595,12 +1398,18 @@ async def reject_application(app_id: int, request: Request, db: Session = Depend
     user = get_current_user(request, db)
     require_admin(user)
     
-    app_obj = db.query(Application).filter_by(id=app_id).first()
+    app_obj = (
+        db.query(Application)
+        .options(load_only(Application.id, Application.user_id, Application.role, Application.status))
+        .filter_by(id=app_id)
+        .first()
+    )
     if not app_obj:
         raise HTTPException(404, detail="Заявка не найдена")
 
     app_obj.status = "rejected"
     db.commit()
+    publish_application_status(app_obj)
     return {"message": "Заявка отклонена"}
 
 @app.post("/admin/application/{application_id}/status")
@@ -625,16 +1434,108 @@ async def update_application_status(
         raise HTTPException(400, detail=f"Недопустимый статус. Допустимые: {allowed_statuses}")
     
     # Находим и обновляем заявку
-    application = db.query(Application).filter_by(id=application_id).first()
+    application = (
+        db.query(Application)
+        .options(load_only(Application.id, Application.user_id, Application.role, Application.status))
+        .filter_by(id=application_id)
+        .first()
+    )
     if not application:
         raise HTTPException(404, detail="Заявка не найдена")
     
     application.status = new_status
     db.commit()
+    publish_application_status(application)
     
     return {"message": f"Статус заявки обновлен на '{new_status}'"}
 
 
+@app.get("/admin/templates/stats")
+async def template_render_stats(request: Request, db: Session = Depends(get_db)):
+    user = get_current_user(request, db)
+    require_admin(user)
+
+    return {
+        name: {
+            "renders": stats["renders"],
+            "avg_ms": round(stats["total_ms"] / stats["renders"], 3),
+            "max_ms": round(stats["max_ms"], 3)
+        }
+        for name, stats in sorted(template_stats.items())
+    }
+
+
+@app.get("/admin/attachments/export.zip")
+async def export_attachments(request: Request, db: Session = Depends(get_db)):
+    user = get_current_user(request, db)
+    require_admin(user)
+
+    rows = (
+        db.query(
+            ThesisAttachment.id, ThesisAttachment.thesis_id, ThesisAttachment.sha256,
+            ThesisAttachment.filename, ThesisAttachment.size, ThesisAttachment.created_at,
+            User.fullname.label("author_name")
+        )
+        .join(Thesis, ThesisAttachment.thesis_id == Thesis.id)
+        .outerjoin(User, Thesis.user_id == User.id)
+        .order_by(ThesisAttachment.thesis_id, ThesisAttachment.id)
+        .all()
+    )
+
+    return StreamingResponse(
+        iter_attachments_zip(rows),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="theses-attachments.zip"'}
+    )
+
+
+# -------------------------------------------------
+# LIVE EVENTS (SSE)
+# -------------------------------------------------
+@app.get("/events")
+async def events(request: Request, scope: Optional[str] = None):
+    # Сессию БД закрываем сразу: тысячи ждущих соединений не держат пул
+    db = SessionLocal()
+    try:
+        user = get_current_user(request, db)
+    finally:
+        db.close()
+
+    if not user:
+        return JSONResponse({"error": "auth_required"}, status_code=401)
+
+    # Страница сама выбирает канал: админка слушает "admin",
+    # профиль — только события своего пользователя
+    if scope == "admin":
+        require_admin(user)
+        channels = ["admin"]
+    else:
+        channels = [user_channel(user.id)]
+
+    queue = broker.subscribe(channels)
+
+    async def stream():
+        try:
+            yield f"retry: {SSE_HEARTBEAT_SECONDS * 1000}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            broker.unsubscribe(queue, channels)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    )
+
+
 # -------------------------------------------------
 # PDF DOWNLOADER
 # -------------------------------------------------
@@ -728,6 +1629,10 @@ async def submit_contact(
     )
 
     db.add(msg)
+    db.flush()
+    row = AdminMessageRow(msg.id, msg.name, msg.email, msg.message, msg.created_at)
     db.commit()
 
+    broker.publish(["admin"], "message_created", row._asdict())
+
     return {"message": "Сообщение отправлено"}
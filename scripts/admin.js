@@ -1,51 +1,121 @@
-  // Обработчик для подтверждения заявки
-  document.querySelectorAll('.approve-btn').forEach(button => {
-    button.addEventListener('click', async (e) => {
-      const appId = e.target.getAttribute('data-id');
-      
-      try {
-        const response = await fetch(`/admin/application/${appId}/approve`, {
-          method: 'POST',
-        });
-        const result = await response.json();
-        
-        if (response.ok) {
-          // Обновляем статус заявки на "approved"
-          const row = document.getElementById(`application-${appId}`);
-          row.querySelector('.status').textContent = "approved";
-          row.querySelector('.status').classList.add('approved');
-        } else {
-          alert(result.detail || 'Ошибка при подтверждении заявки');
-        }
-      } catch (error) {
-        console.error('Ошибка при отправке запроса:', error);
+  // Обработчик кнопок заявок (делегирование: строки приходят и через SSE)
+  document.addEventListener('click', async (e) => {
+    const button = e.target.closest('.approve-btn, .reject-btn');
+    if (!button) return;
+
+    const appId = button.getAttribute('data-id');
+    const approve = button.classList.contains('approve-btn');
+
+    try {
+      const response = await fetch(`/admin/application/${appId}/${approve ? 'approve' : 'reject'}`, {
+        method: 'POST',
+      });
+      const result = await response.json();
+
+      if (response.ok) {
+        updateApplicationRow({ id: appId, status: approve ? 'approved' : 'rejected' });
+      } else {
+        alert(result.detail || (approve ? 'Ошибка при подтверждении заявки' : 'Ошибка при отклонении заявки'));
       }
-    });
+    } catch (error) {
+      console.error('Ошибка при отправке запроса:', error);
+    }
   });
 
-  // Обработчик для отклонения заявки
-  document.querySelectorAll('.reject-btn').forEach(button => {
-    button.addEventListener('click', async (e) => {
-      const appId = e.target.getAttribute('data-id');
-      
-      try {
-        const response = await fetch(`/admin/application/${appId}/reject`, {
-          method: 'POST',
-        });
-        const result = await response.json();
-        
-        if (response.ok) {
-          // Обновляем статус заявки на "rejected"
-          const row = document.getElementById(`application-${appId}`);
-          row.querySelector('.status').textContent = "rejected";
-          row.querySelector('.status').classList.add('rejected');
-        } else {
-          alert(result.detail || 'Ошибка при отклонении заявки');
-        }
-      } catch (error) {
-        console.error('Ошибка при отправке запроса:', error);
-      }
+  // ===== Живые обновления (SSE) =====
+  function formatDate(value) {
+    const d = new Date(value);
+    const pad = (n) => String(n).padStart(2, '0');
+    return `${pad(d.getDate())}.${pad(d.getMonth() + 1)}.${d.getFullYear()} ${pad(d.getHours())}:${pad(d.getMinutes())}`;
+  }
+
+  function makeRow(id, cells) {
+    const row = document.createElement('tr');
+    row.id = id;
+    cells.forEach(value => {
+      const td = document.createElement('td');
+      if (value instanceof Node) td.appendChild(value);
+      else td.textContent = value ?? '';
+      row.appendChild(td);
+    });
+    return row;
+  }
+
+  function prependRow(bodyId, row) {
+    const tbody = document.getElementById(bodyId);
+    const block = tbody.closest('.tab-content');
+    block.querySelector('table').hidden = false;
+    block.querySelector('.empty-note').hidden = true;
+    tbody.prepend(row);
+  }
+
+  function applicationStatusCell(app) {
+    const span = document.createElement('span');
+    span.className = `status ${app.status}`;
+    span.textContent = app.status;
+    return span;
+  }
+
+  function applicationActionsCell(app) {
+    if (app.status !== 'pending') return '—';
+
+    const wrap = document.createDocumentFragment();
+    [['btn success approve-btn', '✔'], ['btn danger reject-btn', '✖']].forEach(([cls, label]) => {
+      const btn = document.createElement('button');
+      btn.className = cls;
+      btn.dataset.id = app.id;
+      btn.textContent = label;
+      wrap.appendChild(btn);
     });
+    return wrap;
+  }
+
+  function updateApplicationRow(app) {
+    const row = document.getElementById(`application-${app.id}`);
+    if (!row) return;
+
+    row.cells[4].replaceChildren(applicationStatusCell(app));
+    const actions = applicationActionsCell(app);
+    if (actions instanceof Node) row.cells[6].replaceChildren(actions);
+    else row.cells[6].textContent = actions;
+  }
+
+  const events = new EventSource('/events?scope=admin');
+
+  events.addEventListener('application_created', (e) => {
+    const app = JSON.parse(e.data);
+    if (document.getElementById(`application-${app.id}`)) return;
+
+    prependRow('applications-body', makeRow(`application-${app.id}`, [
+      app.id, app.full_name, app.email, app.role,
+      applicationStatusCell(app), formatDate(app.submitted_at), applicationActionsCell(app),
+    ]));
+  });
+
+  events.addEventListener('application_status', (e) => {
+    updateApplicationRow(JSON.parse(e.data));
+  });
+
+  events.addEventListener('thesis_created', (e) => {
+    const t = JSON.parse(e.data);
+    if (document.getElementById(`thesis-${t.id}`)) return;
+
+    const row = makeRow(`thesis-${t.id}`, [t.id, t.author_name, t.title, t.status, formatDate(t.created_at)]);
+    row.cells[3].className = 'status';
+    prependRow('theses-body', row);
+  });
+
+  events.addEventListener('thesis_status', (e) => {
+    const t = JSON.parse(e.data);
+    const row = document.getElementById(`thesis-${t.id}`);
+    if (row) row.querySelector('.status').textContent = t.status;
+  });
+
+  events.addEventListener('message_created', (e) => {
+    const msg = JSON.parse(e.data);
+    prependRow('messages-body', makeRow(`message-${msg.id}`, [
+      msg.id, msg.name, msg.email, msg.message, formatDate(msg.created_at),
+    ]));
   });
 
   document.querySelectorAll('.tab').forEach(btn => {
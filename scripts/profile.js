@@ -66,6 +66,105 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   });
 
+  // ===== Вложения =====
+  function renderAttachment(a) {
+    const li = document.createElement('li');
+    li.id = `attachment-${a.id}`;
+
+    const link = document.createElement('a');
+    link.href = `/attachments/${a.id}`;
+    link.textContent = `📎 ${a.filename}`;
+
+    const size = document.createElement('span');
+    size.className = 'attachment-size';
+    size.textContent = `${(a.size / 1024).toFixed(1)} КБ`;
+
+    const remove = document.createElement('button');
+    remove.className = 'remove-attachment-btn';
+    remove.dataset.id = a.id;
+    remove.title = 'Удалить файл';
+    remove.textContent = '✖';
+
+    li.append(link, size, remove);
+    return li;
+  }
+
+  document.querySelectorAll('.attachment-input').forEach(input => {
+    input.addEventListener('change', async () => {
+      const file = input.files[0];
+      if (!file) return;
+
+      const body = new FormData();
+      body.append('file', file);
+
+      const response = await fetch(`/thesis/${input.dataset.thesisId}/attachments`, {
+        method: 'POST',
+        body
+      });
+      const result = await response.json();
+      input.value = '';
+
+      if (response.ok) {
+        input.closest('.thesis-attachments')
+          .querySelector('.attachment-list')
+          .appendChild(renderAttachment(result.attachment));
+      } else {
+        alert(result.message || result.detail || 'Ошибка загрузки файла');
+      }
+    });
+  });
+
+  document.addEventListener('click', async (e) => {
+    const button = e.target.closest('.remove-attachment-btn');
+    if (!button) return;
+
+    const response = await fetch(`/attachments/${button.dataset.id}/delete`, { method: 'POST' });
+
+    if (response.ok) {
+      document.getElementById(`attachment-${button.dataset.id}`)?.remove();
+    } else {
+      alert('Ошибка удаления файла');
+    }
+  });
+
+  // ===== Живые обновления статусов (SSE) =====
+  const applicationLabels = {
+    approved: 'Одобрена',
+    rejected: 'Отклонена',
+    pending: 'На рассмотрении',
+  };
+
+  const events = new EventSource('/events');
+
+  events.addEventListener('application_status', (e) => {
+    const app = JSON.parse(e.data);
+    const badge = document.createElement('span');
+    const status = applicationLabels[app.status] ? app.status : 'pending';
+    badge.className = `status ${status}`;
+    badge.textContent = applicationLabels[status];
+
+    document.getElementById('application-status').replaceChildren(badge);
+    document.getElementById('profile-role').textContent = app.role;
+  });
+
+  events.addEventListener('thesis_status', (e) => {
+    const t = JSON.parse(e.data);
+    const header = document.querySelector(`#thesis-${t.id} .thesis-header`);
+    if (!header) return;
+
+    let badge = header.querySelector('.status');
+    if (t.status === 'submitted') {
+      badge?.remove();
+      return;
+    }
+    if (!badge) {
+      badge = document.createElement('span');
+      header.appendChild(badge);
+    }
+    badge.className = `status ${t.status}`;
+    badge.textContent = t.status.charAt(0).toUpperCase() + t.status.slice(1);
+  });
+
   // ===== Клик вне модалки =====
   window.addEventListener('click', (e) => {
     if (e.target.classList.contains('modal')) {